@@ -1,23 +1,283 @@
 # Copyright (c) Gorilla-Lab. All rights reserved.
 import os
 import os.path as osp
-import glob
+import errno
+import functools
+import hashlib
+import importlib
+import json
+import mmap
 import shutil
 import warnings
 import logging
-from typing import List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 import torch.distributed as dist
 
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
 from ..core import master_only
 from ..version import __version__
 
+# records `{dst relative to backup_dir: [size, mtime_ns, sha256]}` of the
+# files backed up in incremental mode
+MANIFEST_NAME = ".manifest.json"
+
+
+@functools.lru_cache(maxsize=None)
+def _extension_versions() -> Tuple[Tuple[str, str], ...]:
+    r"""Versions of the installed gorilla extensions, probed once.
+
+    Not probed at import time, since the extensions import gorilla-core.
+    """
+    versions = []
+    for package in ["gorilla2d", "gorilla3d"]:
+        try:
+            module = importlib.import_module(package)
+        except ImportError:
+            continue
+        version = getattr(module, "__version__", None)
+        if version is not None:
+            versions.append((package, version))
+    return tuple(versions)
+
+
+def _check_same_file(src: str, dst: str) -> None:
+    # as `shutil.copyfile` does, refuse before `dst` gets truncated
+    try:
+        same = osp.samefile(src, dst)
+    except OSError:
+        # `dst` does not exist yet
+        return
+    if same:
+        raise shutil.SameFileError(
+            f"{src!r} and {dst!r} are the same file")
+
+
+def _copy_file_range(src: str, dst: str) -> None:
+    _check_same_file(src, dst)
+    src_fd = os.open(src, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        size = os.fstat(src_fd).st_size
+        dst_fd = os.open(
+            dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o666)
+        try:
+            while size > 0:
+                copied = os.copy_file_range(src_fd, dst_fd, size)
+                if copied == 0:
+                    # some file systems report 0 instead of failing, let the
+                    # caller fall back rather than keep a truncated copy
+                    raise OSError(errno.EIO,
+                                  "copy_file_range stopped before the end",
+                                  src)
+                size -= copied
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+def _copy_file(src: str, dst: str) -> str:
+    r"""Copy the content and permission bits of ``src`` to ``dst``.
+
+    The data is copied inside the kernel (``copy_file_range`` on Linux,
+    otherwise the sendfile/fcopyfile fast path of ``shutil.copyfile``).
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            _copy_file_range(src, dst)
+        except shutil.SameFileError:
+            raise
+        except OSError:
+            # e.g. unsupported by the kernel or file system
+            shutil.copyfile(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+    shutil.copymode(src, dst)
+    return dst
+
+
+def _copy_direct(src: str,
+                 dst: str,
+                 size_threshold: int = 8 * 1024 * 1024) -> str:
+    r"""Copy large files with ``O_DIRECT`` writes to bypass the page cache.
+
+    Backups are hardly ever read back right away, so caching their pages only
+    evicts useful ones. Small files, platforms without ``O_DIRECT`` and file
+    systems rejecting it fall back to `_copy_file`.
+    """
+    if (fcntl is None or not hasattr(os, "O_DIRECT")
+            or os.stat(src).st_size < size_threshold):
+        return _copy_file(src, dst)
+
+    _check_same_file(src, dst)
+    chunk_size = 1 << 20
+    try:
+        dst_fd = os.open(
+            dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT
+            | os.O_CLOEXEC, 0o644)
+        try:
+            # anonymous mmap is page aligned, as required by O_DIRECT
+            with mmap.mmap(-1, chunk_size) as buf, \
+                    open(src, "rb", buffering=0) as fsrc:
+                direct = True
+                while True:
+                    size = os.readv(fsrc.fileno(), [buf])
+                    if size == 0:
+                        break
+                    if direct and size < chunk_size:
+                        # the unaligned tail has to go through the page cache
+                        flags = fcntl.fcntl(dst_fd, fcntl.F_GETFL)
+                        fcntl.fcntl(dst_fd, fcntl.F_SETFL,
+                                    flags & ~os.O_DIRECT)
+                        direct = False
+                    with memoryview(buf) as view:
+                        written = 0
+                        while written < size:
+                            written += os.write(dst_fd, view[written:size])
+        finally:
+            os.close(dst_fd)
+    except OSError as e:
+        # the file system does not support O_DIRECT
+        if e.errno != errno.EINVAL:
+            raise
+        return _copy_file(src, dst)
+    shutil.copymode(src, dst)
+    return dst
+
+
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # python >= 3.11
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        sha = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+        return sha.hexdigest()
+
+
+def _is_inside(path: str, dir_path: str) -> bool:
+    # resolve the parent only, a symlink `path` itself is safe to unlink
+    parent = osp.realpath(osp.dirname(osp.abspath(path)))
+    dir_path = osp.realpath(dir_path)
+    return osp.commonpath([parent, dir_path]) == dir_path
+
+
+def _filter_unchanged(backup_dir: str, copy_list: List[Tuple[str, str]],
+                      manifest: dict) -> Tuple[List[Tuple[str, str]], dict]:
+    r"""Drop the ``(src, dst)`` pairs already backed up according to
+    ``manifest``, and return them along with the updated manifest.
+
+    A file is unchanged if its size and mtime match the record, or else if
+    its content digest does.
+    """
+    pending = []
+    new_manifest = {}
+    for src, dst in copy_list:
+        key = osp.relpath(dst, backup_dir)
+        stat = os.stat(src)
+        record = manifest.get(key)
+        if not (isinstance(record, list) and len(record) == 3):
+            # missing or malformed record
+            record = None
+        if record is not None and osp.isfile(dst):
+            if record[:2] == [stat.st_size, stat.st_mtime_ns]:
+                new_manifest[key] = record
+                continue
+            digest = _file_digest(src)
+            if record[2] == digest:
+                new_manifest[key] = [stat.st_size, stat.st_mtime_ns, digest]
+                continue
+        else:
+            digest = _file_digest(src)
+        new_manifest[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        # the previous copy may be read-only after `copymode`, but never
+        # unlink anything outside of the backup
+        if _is_inside(dst, backup_dir):
+            try:
+                os.remove(dst)
+            except FileNotFoundError:
+                pass
+        pending.append((src, dst))
+    return pending, new_manifest
+
+
+def _member_dir(backup_dir: str, name: str) -> str:
+    r"""Destination of the backup member dir ``name`` inside ``backup_dir``.
+
+    Relative members keep their path, while absolute ones and those outside
+    the working directory are placed by their absolute path, so that no
+    destination can fall outside ``backup_dir``.
+    """
+    rel_name = osp.normpath(name)
+    if (osp.isabs(rel_name) or rel_name == os.pardir
+            or rel_name.startswith(os.pardir + os.sep)):
+        rel_name = osp.splitdrive(osp.abspath(name))[1].lstrip(os.sep)
+    return osp.join(backup_dir, rel_name)
+
+
+def _list_files(root: str, suffixes: Tuple[str]) -> List[str]:
+    r"""List the files under ``root`` whose names end with ``suffixes``."""
+    stack = [root]
+    files = []
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                # symlinked dirs are followed, as `shutil.copytree` did
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.endswith(suffixes):
+                    files.append(entry.path)
+    return files
+
+
+def _copy_files(copy_list: List[Tuple[str, str]]) -> None:
+    r"""Copy the ``(src, dst)`` pairs concurrently, creating parent dirs."""
+    made_dirs = set()
+    lock = threading.Lock()
+
+    def _ensure_dir(dir_name):
+        # `in` on a set is atomic under the GIL, so created dirs are checked
+        # without the lock and `makedirs` runs at most once per dir
+        if dir_name in made_dirs:
+            return
+        with lock:
+            if dir_name in made_dirs:
+                return
+            os.makedirs(dir_name, exist_ok=True)
+            made_dirs.add(dir_name)
+
+    def _copy_one(src, dst):
+        _ensure_dir(osp.dirname(dst))
+        _copy_direct(src, dst)
+
+    # copying is I/O bound and releases the GIL during the syscalls
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_copy_one, src, dst) for src, dst in copy_list
+        ]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # re-raise the first failure without waiting for queued copies
+            for future in futures:
+                future.cancel()
+            raise
+
 
 @master_only
 def backup(backup_dir: str,
            backup_list: [List[str], str],
            contain_suffix: List = ["*.py"],
            strict: bool = False,
+           incremental: bool = False,
            **kwargs) -> None:
     r"""Author: liang.zhihao
     The backup helper function
@@ -27,33 +287,41 @@ def backup(backup_dir: str,
         backup_list (str or List of str): the backup members
         strict (bool, optional): tolerate backup members missing or not.
             Defaults to False.
+        incremental (bool, optional): only copy the files changed since the
+            last incremental backup into ``backup_dir`` instead of backing
+            up from scratch. Defaults to False.
     """
     logger = logging.getLogger(__name__)
 
-    # if exist, remove the backup dir to avoid copytree exist error
-    if osp.exists(backup_dir):
+    manifest_path = osp.join(backup_dir, MANIFEST_NAME)
+    manifest = None
+    if incremental and osp.isfile(manifest_path):
+        try:
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+        except ValueError:
+            # corrupt manifest, back up from scratch
+            manifest = None
+        if not isinstance(manifest, dict):
+            manifest = None
+    if manifest is None and osp.exists(backup_dir):
+        # remove the old backup to avoid mixing stale files
         shutil.rmtree(backup_dir)
 
     os.makedirs(backup_dir, exist_ok=True)
-    # log gorilla version
-    logger.info(f"gorilla-core version is {__version__}")
-    try:
-        from gorilla2d import __version__ as g2_ver
-        logger.info(f"gorilla2d version is {g2_ver}")
-    except:
-        pass
-    try:
-        from gorilla3d import __version__ as g3_ver
-        logger.info(f"gorilla3d version is {g3_ver}")
-    except:
-        pass
-
-    logger.info(f"backup files at {backup_dir}")
+    # log gorilla version and the backup dir in a single record
+    msgs = [f"gorilla-core version is {__version__}"]
+    for package, version in _extension_versions():
+        msgs.append(f"{package} version is {version}")
+    msgs.append(f"backup files at {backup_dir}")
+    logger.info("\n".join(msgs))
     if not isinstance(backup_list, list):
         backup_list = [backup_list]
     if not isinstance(contain_suffix, list):
         contain_suffix = [contain_suffix]
 
+    wanted = tuple(suffix.lstrip("*") for suffix in contain_suffix)
+    copy_list = []
     for name in backup_list:
         # deal with missing file or dir
         miss_flag = (not osp.exists(name))
@@ -67,17 +335,34 @@ def backup(backup_dir: str,
             warnings.warn(f"'{name}' maybe the unsuitable to backup")
         if osp.isfile(name):
             # just copy the filename
-            dst_name = name.split("/")[-1]
-            shutil.copy(name, osp.join(backup_dir, dst_name))
+            dst_name = osp.basename(name)
+            copy_list.append((name, osp.join(backup_dir, dst_name)))
         if osp.isdir(name):
-            # only match '.py' files
-            files = glob.iglob(osp.join(name, "**", "*.*"), recursive=True)
-            ignore_suffix = set(
-                map(lambda x: "*." + x.split("/")[-1].split(".")[-1], files))
-            for suffix in contain_suffix:
-                if suffix in ignore_suffix:
-                    ignore_suffix.remove(suffix)
-            # copy dir
-            shutil.copytree(name,
-                            osp.join(backup_dir, name),
-                            ignore=shutil.ignore_patterns(*ignore_suffix))
+            # only copy the files matching `contain_suffix`
+            dst_dir = _member_dir(backup_dir, name)
+            for src in _list_files(name, wanted):
+                copy_list.append(
+                    (src, osp.join(dst_dir, osp.relpath(src, name))))
+
+    # copy members sharing a destination only once, the last member wins as
+    # with a serial copy instead of racing on the same file
+    dst_to_src = {dst: src for src, dst in copy_list}
+    copy_list = [(src, dst) for dst, src in dst_to_src.items()]
+
+    if incremental:
+        copy_list, new_manifest = _filter_unchanged(backup_dir, copy_list,
+                                                    manifest or {})
+        # remove the files which are no longer backed up
+        for key in (manifest or {}).keys() - new_manifest.keys():
+            stale = osp.join(backup_dir, key)
+            if osp.isfile(stale) and _is_inside(stale, backup_dir):
+                os.remove(stale)
+
+    _copy_files(copy_list)
+
+    if incremental:
+        # write aside and rename, so an interrupted write keeps the old one
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(new_manifest, f)
+        os.replace(tmp_path, manifest_path)
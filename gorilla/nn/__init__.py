@@ -23,4 +23,15 @@ auto_registry(MODULES, globals(), type=torch.nn.Module)
 
 from .layer_builder import NAME_MAP, build_from_package, get_torch_layer_caller
 
-__all__ = [k for k in globals().keys() if not k.startswith("_")]
+__all__ = [
+    "bias_init_with_prob", "constant_init", "kaiming_init", "normal_init",
+    "uniform_init", "xavier_init", "c2_msra_init", "c2_xavier_init",
+    "geometric_init", "GorillaConv", "GorillaFC", "MultiFC", "DenseFC",
+    "GraphConvolution", "GCN", "Transformer", "TransformerEncoder",
+    "TransformerDecoder", "TransformerEncoderLayer", "TransformerDecoderLayer",
+    "build_transformer", "VGG", "AlexNet", "BasicBlock", "Bottleneck",
+    "resnet", "resnet18", "resnet34", "resnet50", "resnet101", "resnet152",
+    "resnext50_32x4d", "resnext101_32x8d", "wide_resnet50_2",
+    "wide_resnet101_2", "NAME_MAP", "build_from_package",
+    "get_torch_layer_caller"
+]
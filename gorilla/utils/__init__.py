@@ -5,7 +5,7 @@ from .typing import (type_assert, convert_into_torch_tensor,
 from .gpu import (get_free_gpu, set_cuda_visible_devices)
 
 from .path import (is_filepath, check_file, check_dir, fopen, symlink, scandir,
-                   find_vcs_root, mkdir_or_exist)
+                   list_dir, find_vcs_root, mkdir_or_exist)
 
 from .processbar import (ProgressBar, track_progress, init_pool,
                          track_parallel_progress, track)
@@ -2,6 +2,7 @@
 
 import os
 import os.path as osp
+import uuid
 from pathlib import Path
 
 
@@ -9,12 +10,12 @@ def is_filepath(x) -> bool:
     r"""Path check function.
 
     Args:
-        x (str | obj:`Path`): path address
+        x (str | obj:`os.PathLike`): path address
 
     Returns:
         bool: is a path or not
     """
-    return isinstance(x, (str, Path))
+    return isinstance(x, (str, os.PathLike))
 
 
 def check_file(filepath: [str, Path],
@@ -22,37 +23,33 @@ def check_file(filepath: [str, Path],
     r"""Check path exists and file or not.
 
     Args:
-        filepath (str | obj:`Path`): path address
+        filepath (str | obj:`os.PathLike`): path address
         msg_tmpl (str, optional): error message pattern. Defaults to "file `{}` not exist or is a directory".
     """
-    if isinstance(filepath, str):
+    if isinstance(filepath, (str, os.PathLike)):
+        filepath = os.fspath(filepath)
         if not osp.isfile(filepath):
             raise FileNotFoundError(msg_tmpl.format(filepath))
-    elif isinstance(filepath, Path):
-        if not filepath.is_file():
-            raise FileNotFoundError(msg_tmpl.format(str(filepath)))
 
 
 def check_dir(dir_path, msg_tmpl="dir `{}` not exist or is a directory"):
     r"""Check path exists and file or not.
 
     Args:
-        dir_path (str | obj:`Path`): path address
+        dir_path (str | obj:`os.PathLike`): path address
         msg_tmpl (str, optional): error message pattern. Defaults to "dir `{}` not exist or is a directory".
     """
-    if isinstance(dir_path, str):
+    if isinstance(dir_path, (str, os.PathLike)):
+        dir_path = os.fspath(dir_path)
         if not osp.isdir(dir_path):
             raise FileNotFoundError(msg_tmpl.format(dir_path))
-    elif isinstance(dir_path, Path):
-        if not dir_path.is_dir():
-            raise FileNotFoundError(msg_tmpl.format(dir_path))
 
 
 def fopen(filepath, *args, **kwargs):
     """File open wrapper function
 
     Args:
-        filepath (str | obj:`Path`): path address
+        filepath (str | obj:`os.PathLike`): path address
 
     Raises:
         ValueError: not a avaliable file
@@ -65,7 +62,7 @@ def fopen(filepath, *args, **kwargs):
     except:
         raise ValueError(
             "`filepath` should be a string or a Path and not a directory")
-    return open(str(filepath), *args, **kwargs)
+    return open(os.fspath(filepath), *args, **kwargs)
 
 
 def mkdir_or_exist(dir_name, mode=0o777):
@@ -89,28 +86,58 @@ def symlink(src, dst, overwrite=True, **kwargs):
         dst (str | obj:`Path`): destination directory address
         overwrite (bool, optional): overwrite destination directory ot not. Defaults to True.
     """
-    if osp.lexists(dst) and overwrite:
-        os.remove(dst)
-    os.symlink(src, dst, **kwargs)
-
-
-def scandir(dir_path, suffix=None, recursive=False):
+    if not (overwrite and osp.lexists(dst)):
+        os.symlink(src, dst, **kwargs)
+        return
+    # link to a temporary name and rename it over `dst`, so that `dst` is
+    # swapped atomically and never missing for concurrent readers
+    tmp = f"{os.fspath(dst)}.{uuid.uuid4().hex}.tmp"
+    os.symlink(src, tmp, **kwargs)
+    try:
+        os.replace(tmp, dst)
+    except OSError:
+        os.remove(tmp)
+        raise
+
+
+def scandir(dir_path,
+            suffix=None,
+            recursive=False,
+            prefix=None,
+            return_entries=False,
+            on_error=None,
+            follow_symlinks=True):
     r"""Scan a directory to find the interested files.
 
     Args:
-        dir_path (str | obj:`Path`): Path of the directory.
+        dir_path (str | obj:`os.PathLike`): Path of the directory.
         suffix (str | tuple(str), optional): 
             File suffix that we are interested in. Default: None.
         recursive (bool, optional): 
             If set to True, recursively scan the directory. Default: False.
+        prefix (str | tuple(str), optional):
+            Relative path prefix that we are interested in. Default: None.
+        return_entries (bool, optional):
+            If set to True, yield the `os.DirEntry` objects instead of the
+            relative pathes, so that their cached `name`, `path` and `stat()`
+            can be reused. Default: False.
+        on_error (callable, optional):
+            Called with the `OSError` of a directory that can not be scanned
+            (e.g. permission denied or removed while scanning), which is then
+            skipped. It can re-raise the error to abort. If None, unreadable
+            sub directories are skipped silently while an unreadable
+            `dir_path` raises. Default: None.
+        follow_symlinks (bool, optional):
+            If set to False, symlinks are neither yielded nor descended into.
+            Default: True.
     Returns:
         A generator for all the interested files with relative pathes.
     """
-    if isinstance(dir_path, (str, Path)):
-        dir_path = str(dir_path)
-    else:
+    if isinstance(dir_path, (str, os.PathLike)):
+        dir_path = os.fspath(dir_path)
+    if not isinstance(dir_path, str):
         raise TypeError(
-            f"`dir_path` must be a string or Path object, but got {type(dir_path)}"
+            f"`dir_path` must be a string or PathLike object, but got {type(dir_path)}"
         )
 
     if (suffix is not None) and not isinstance(suffix, (str, tuple)):
@@ -118,25 +145,91 @@ def scandir(dir_path, suffix=None, recursive=False):
             f"`suffix` must be a string or tuple of strings, but got {type(suffix)}"
         )
 
-    root = dir_path
+    if (prefix is not None) and not isinstance(prefix, (str, tuple)):
+        raise TypeError(
+            f"`prefix` must be a string or tuple of strings, but got {type(prefix)}"
+        )
 
-    def _scandir(dir_path, suffix, recursive):
-        for entry in os.scandir(dir_path):
-            if not entry.name.startswith('.') and entry.is_file():
-                rel_path = osp.relpath(entry.path, root)
-                if suffix is None:
-                    yield rel_path
-                elif rel_path.endswith(suffix):
-                    yield rel_path
-            else:
-                if recursive:
-                    yield from _scandir(entry.path,
-                                        suffix=suffix,
-                                        recursive=recursive)
-                else:
-                    continue
+    # entries are yielded relative to `dir_path` by slicing `entry.path`,
+    # which is much cheaper than `osp.relpath`, so the root has to be free
+    # of redundant separators
+    dir_path = osp.normpath(dir_path)
+    base_len = len(dir_path.rstrip(os.sep)) + 1
+
+    def _scandir(dir_path, recursive):
+        # walk with an explicit stack instead of recursive generators, each
+        # directory is fully read and closed before descending, so only one
+        # file descriptor is open at a time
+        stack = [dir_path]
+        while stack:
+            sub_dirs = []
+            cur_dir = stack.pop()
+            try:
+                it = os.scandir(cur_dir)
+            except OSError as e:
+                if on_error is not None:
+                    on_error(e)
+                elif cur_dir is dir_path:
+                    raise
+                continue
+            # `DirEntry.is_dir/is_file` are answered from the cached d_type,
+            # so only symlinks cost an extra stat()
+            with it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        if recursive:
+                            sub_dirs.append(entry.path)
+                    elif return_entries:
+                        if entry.is_file(follow_symlinks=follow_symlinks):
+                            yield entry
+                    elif entry.is_file(follow_symlinks=follow_symlinks):
+                        yield entry.path[base_len:]
+            # reversed to visit sub directories in listing order
+            stack.extend(reversed(sub_dirs))
+
+    files = _scandir(dir_path, recursive=recursive)
+    # fast path, nothing to filter
+    if prefix is None and suffix is None:
+        return files
+    if return_entries:
+        # filter on the relative path, but hand out the `DirEntry` itself
+        return (entry for entry in files
+                if (prefix is None or entry.path[base_len:].startswith(prefix))
+                and (suffix is None or entry.path[base_len:].endswith(suffix)))
+    # specialize the filter once, so that each entry costs a single
+    # `startswith`/`endswith` call (both accept a tuple natively)
+    if prefix is None:
+        return (p for p in files if p.endswith(suffix))
+    if suffix is None:
+        return (p for p in files if p.startswith(prefix))
+    return (p for p in files
+            if p.startswith(prefix) and p.endswith(suffix))
+
+
+def list_dir(dir_path,
+             suffix=None,
+             recursive=False,
+             prefix=None,
+             on_error=None,
+             follow_symlinks=True):
+    r"""List the interested files of a directory in sorted order.
+
+    The arguments are the same as `scandir`.
 
-    return _scandir(dir_path, suffix=suffix, recursive=recursive)
+    Returns:
+        list[str]: The sorted relative pathes of the interested files.
+    """
+    files = list(
+        scandir(dir_path,
+                suffix=suffix,
+                recursive=recursive,
+                prefix=prefix,
+                on_error=on_error,
+                follow_symlinks=follow_symlinks))
+    files.sort()
+    return files
 
 
 def find_vcs_root(path, markers=(".git", )):
@@ -151,9 +244,24 @@ def find_vcs_root(path, markers=(".git", )):
     if osp.isfile(path):
         path = osp.dirname(path)
 
+    # plain names are matched with one directory read per level instead of
+    # one stat per marker, which only pays off for several of them
+    seps = tuple(sep for sep in (os.sep, os.altsep) if sep)
+    name_markers = set(m for m in markers if not any(s in m for s in seps))
+    if len(name_markers) < 2:
+        name_markers = set()
+    stat_markers = [m for m in markers if m not in name_markers]
+
     prev, cur = None, osp.abspath(osp.expanduser(path))
     while cur != prev:
-        if any(osp.exists(osp.join(cur, marker)) for marker in markers):
+        if any(osp.exists(osp.join(cur, marker)) for marker in stat_markers):
             return cur
-        prev, cur = cur, osp.split(cur)[0]
+        if name_markers:
+            try:
+                with os.scandir(cur) as it:
+                    if any(entry.name in name_markers for entry in it):
+                        return cur
+            except OSError:
+                pass
+        prev, cur = cur, osp.dirname(cur)
     return None
@@ -0,0 +1,225 @@
+# Copyright (c) Gorilla-Lab. All rights reserved.
+import errno
+import importlib
+import json
+import os
+import os.path as osp
+import shutil
+import sys
+import types
+
+import pytest
+
+from gorilla.config.backup import (_copy_direct, _copy_file,
+                                   _extension_versions, backup)
+
+
+def _touch(path, content='x'):
+    os.makedirs(osp.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _list_backup(backup_dir):
+    return sorted(
+        osp.relpath(osp.join(root, name), backup_dir)
+        for root, _, names in os.walk(backup_dir) for name in names)
+
+
+def test_copy_file_range_zero(tmp_path, monkeypatch):
+    src, dst = str(tmp_path / 'a.bin'), str(tmp_path / 'b.bin')
+    with open(src, 'wb') as f:
+        f.write(b'x' * 1000)
+    # a file system reporting 0 must not leave a truncated copy
+    if hasattr(os, 'copy_file_range'):
+        monkeypatch.setattr(os, 'copy_file_range', lambda *args: 0)
+    _copy_file(src, dst)
+    with open(dst, 'rb') as f:
+        assert f.read() == b'x' * 1000
+
+
+def test_copy_same_file(tmp_path):
+    src = str(tmp_path / 'a.bin')
+    data = os.urandom(9 * 1024 * 1024)
+    with open(src, 'wb') as f:
+        f.write(data)
+    # the source must be left untouched
+    for copy in [_copy_file, _copy_direct]:
+        with pytest.raises(shutil.SameFileError):
+            copy(src, src)
+        with open(src, 'rb') as f:
+            assert f.read() == data
+
+
+@pytest.mark.skipif(not hasattr(os, 'O_DIRECT'), reason='requires O_DIRECT')
+def test_copy_direct(tmp_path, monkeypatch):
+    src, dst = str(tmp_path / 'a.bin'), str(tmp_path / 'b.bin')
+    # larger than the threshold with an unaligned tail
+    data = os.urandom(9 * 1024 * 1024 + 123)
+    with open(src, 'wb') as f:
+        f.write(data)
+    _copy_direct(src, dst)
+    with open(dst, 'rb') as f:
+        assert f.read() == data
+
+    # short writes are continued
+    os_write = os.write
+    monkeypatch.setattr(os, 'write',
+                        lambda fd, buf: os_write(fd, buf[:4096 * 16]))
+    _copy_direct(src, dst)
+    with open(dst, 'rb') as f:
+        assert f.read() == data
+    monkeypatch.setattr(os, 'write', os_write)
+
+    # file systems rejecting O_DIRECT fall back to a buffered copy
+    os_open = os.open
+
+    def _open(path, flags, *args):
+        if flags & os.O_DIRECT:
+            raise OSError(errno.EINVAL, 'O_DIRECT not supported')
+        return os_open(path, flags, *args)
+
+    monkeypatch.setattr(os, 'open', _open)
+    os.remove(dst)
+    _copy_direct(src, dst)
+    with open(dst, 'rb') as f:
+        assert f.read() == data
+
+
+def test_backup(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    for name in [
+            'src/a.py', 'src/sub/b.py', 'src/c.txt', 'src/empty/d.txt',
+            'src/.hidden/e.py', 'tools/run.py'
+    ]:
+        _touch(name)
+    backup('bk', ['src', 'tools/run.py'])
+    assert _list_backup('bk') == [
+        'run.py', 'src/.hidden/e.py', 'src/a.py', 'src/sub/b.py'
+    ]
+    with open('bk/src/a.py') as f:
+        assert f.read() == 'x'
+
+    backup('bk', 'src', contain_suffix=['*.py', '*.txt'])
+    assert _list_backup('bk') == [
+        'src/.hidden/e.py', 'src/a.py', 'src/c.txt', 'src/empty/d.txt',
+        'src/sub/b.py'
+    ]
+
+
+def test_backup_same_dst(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    _touch('x/t.py', 'x' * 1000)
+    _touch('y/t.py', 'y' * 2000)
+    # the last member with the same destination wins
+    backup('bk', ['x/t.py', 'y/t.py'])
+    with open('bk/t.py') as f:
+        assert f.read() == 'y' * 2000
+
+
+def test_backup_symlink_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    _touch('real/r.py')
+    _touch('src/a.py')
+    os.symlink(osp.join('..', 'real'), osp.join('src', 'linked'))
+    backup('bk', 'src')
+    assert _list_backup('bk') == ['src/a.py', 'src/linked/r.py']
+
+
+def test_backup_absolute_member(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    _touch('proj/a.py', 'a')
+    _touch('work/.keep')
+    monkeypatch.chdir(str(tmp_path / 'work'))
+    abs_member = str(tmp_path / 'proj')
+    for incremental in [False, True, True]:
+        backup('bk', [abs_member, '../proj'], incremental=incremental)
+        # the source is untouched and lands inside the backup dir once
+        with open(osp.join(abs_member, 'a.py')) as f:
+            assert f.read() == 'a'
+        dst = osp.join('bk', abs_member.lstrip(os.sep), 'a.py')
+        with open(dst) as f:
+            assert f.read() == 'a'
+
+
+def test_backup_copy_error(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    _touch('src/a.py')
+
+    def _raise(src, dst):
+        raise PermissionError(dst)
+
+    backup_module = importlib.import_module('gorilla.config.backup')
+    monkeypatch.setattr(backup_module, '_copy_direct', _raise)
+    with pytest.raises(PermissionError):
+        backup('bk', 'src')
+
+
+def test_backup_incremental(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    _touch('src/a.py', 'a')
+    _touch('src/sub/b.py', 'b')
+    backup('bk', 'src', incremental=True)
+    assert _list_backup('bk') == ['.manifest.json', 'src/a.py', 'src/sub/b.py']
+
+    # unchanged files are skipped, so the edited copy is kept
+    _touch('bk/src/a.py', 'kept')
+    backup('bk', 'src', incremental=True)
+    with open('bk/src/a.py') as f:
+        assert f.read() == 'kept'
+
+    # changed files are copied again, even over a read-only copy
+    os.chmod('bk/src/sub/b.py', 0o444)
+    _touch('src/sub/b.py', 'changed')
+    # stale files are removed
+    os.remove('src/a.py')
+    backup('bk', 'src', incremental=True)
+    assert _list_backup('bk') == ['.manifest.json', 'src/sub/b.py']
+    with open('bk/src/sub/b.py') as f:
+        assert f.read() == 'changed'
+
+    # a missing or corrupt manifest rebuilds the backup from scratch
+    for manifest in [None, '{']:
+        _touch('bk/src/junk.py')
+        os.remove('bk/.manifest.json')
+        if manifest is not None:
+            _touch('bk/.manifest.json', manifest)
+        backup('bk', 'src', incremental=True)
+        assert _list_backup('bk') == ['.manifest.json', 'src/sub/b.py']
+        with open('bk/src/sub/b.py') as f:
+            assert f.read() == 'changed'
+
+    # malformed records are treated as missing
+    _touch('bk/.manifest.json', json.dumps({'src/sub/b.py': 1}))
+    _touch('bk/src/sub/b.py', 'stale')
+    backup('bk', 'src', incremental=True)
+    with open('bk/src/sub/b.py') as f:
+        assert f.read() == 'changed'
+
+    # stale records never remove files outside of the backup dir
+    _touch('keep.py')
+    with open('bk/.manifest.json') as f:
+        manifest = json.load(f)
+    manifest[osp.join('..', 'keep.py')] = [1, 0, '']
+    _touch('bk/.manifest.json', json.dumps(manifest))
+    backup('bk', 'src', incremental=True)
+    assert osp.isfile('keep.py')
+    assert not osp.exists('bk/.manifest.json.tmp')
+
+    # a full backup drops the manifest
+    backup('bk', 'src')
+    assert _list_backup('bk') == ['src/sub/b.py']
+
+
+def test_extension_versions(monkeypatch):
+    versioned = types.ModuleType('gorilla2d')
+    versioned.__version__ = '1.0'
+    monkeypatch.setitem(sys.modules, 'gorilla2d', versioned)
+    # an installed extension without `__version__` is skipped
+    monkeypatch.setitem(sys.modules, 'gorilla3d',
+                        types.ModuleType('gorilla3d'))
+    _extension_versions.cache_clear()
+    try:
+        assert _extension_versions() == (('gorilla2d', '1.0'), )
+    finally:
+        _extension_versions.cache_clear()
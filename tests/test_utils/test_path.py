@@ -1,4 +1,5 @@
 # Copyright (c) Open-MMLab. All rights reserved.
+import os
 import os.path as osp
 from pathlib import Path
 
@@ -7,16 +8,36 @@ import pytest
 import gorilla
 
 
+class PathLike:
+    r"""A minimal `os.PathLike` that is not a `Path`."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __fspath__(self):
+        return self.path
+
+
 def test_is_filepath():
     assert gorilla.is_filepath(__file__)
     assert gorilla.is_filepath('abc')
     assert gorilla.is_filepath(Path('/etc'))
+    assert gorilla.is_filepath(PathLike('/etc'))
     assert not gorilla.is_filepath(0)
+    assert not gorilla.is_filepath(b'/etc')
 
 
 def test_fopen():
     assert hasattr(gorilla.fopen(__file__), 'read')
     assert hasattr(gorilla.fopen(Path(__file__)), 'read')
+    assert hasattr(gorilla.fopen(PathLike(__file__)), 'read')
+
+
+def test_check_dir():
+    gorilla.check_dir(osp.dirname(__file__))
+    gorilla.check_dir(PathLike(osp.dirname(__file__)))
+    with pytest.raises(FileNotFoundError):
+        gorilla.check_dir(PathLike(__file__))
 
 
 def test_check_file_exist():
@@ -25,11 +46,48 @@ def test_check_file_exist():
         gorilla.check_file('no_such_file.txt')
 
 
+def test_check_file_removed(tmp_path):
+    filename = str(tmp_path / 'a.txt')
+    open(filename, 'w').close()
+    gorilla.check_file(filename)
+    # a removed file is reported missing right away
+    os.remove(filename)
+    with pytest.raises(FileNotFoundError):
+        gorilla.check_file(filename)
+
+
+def test_mkdir_or_exist(tmp_path):
+    dir_name = str(tmp_path / 'a' / 'b')
+    gorilla.mkdir_or_exist(dir_name)
+    gorilla.mkdir_or_exist(dir_name)
+    assert osp.isdir(dir_name)
+    # a removed directory is always created again
+    os.rmdir(dir_name)
+    gorilla.mkdir_or_exist(dir_name)
+    assert osp.isdir(dir_name)
+
+
+def test_symlink(tmp_path):
+    src1, src2 = str(tmp_path / 'a'), str(tmp_path / 'b')
+    dst = str(tmp_path / 'link')
+    gorilla.mkdir_or_exist(src1)
+    gorilla.mkdir_or_exist(src2)
+    gorilla.symlink(src1, dst)
+    assert os.readlink(dst) == src1
+    gorilla.symlink(src2, dst)
+    assert os.readlink(dst) == src2
+    assert sorted(os.listdir(tmp_path)) == ['a', 'b', 'link']
+    with pytest.raises(FileExistsError):
+        gorilla.symlink(src1, dst, overwrite=False)
+
+
 def test_scandir():
     folder = osp.join(osp.dirname(osp.dirname(__file__)), 'data/for_scan')
     filenames = ['a.bin', '1.txt', '2.txt', '1.json', '2.json']
     assert set(gorilla.scandir(folder)) == set(filenames)
     assert set(gorilla.scandir(Path(folder))) == set(filenames)
+    assert set(gorilla.scandir(folder + '//')) == set(filenames)
+    assert set(gorilla.scandir(PathLike(folder))) == set(filenames)
     assert set(gorilla.scandir(folder, '.txt')) == set(
         [filename for filename in filenames if filename.endswith('.txt')])
     assert set(gorilla.scandir(folder, ('.json', '.txt'))) == set([
@@ -50,7 +108,60 @@ def test_scandir():
         filename for filename in filenames_recursive
         if filename.endswith('.txt')
     ])
+    assert set(gorilla.scandir(folder, prefix='1')) == set(
+        [filename for filename in filenames if filename.startswith('1')])
+    assert set(gorilla.scandir(folder, '.txt', recursive=True,
+                               prefix='sub')) == set(['sub/1.txt'])
+    entries = list(
+        gorilla.scandir(folder, '.txt', recursive=True, return_entries=True))
+    assert set(entry.name for entry in entries) == set(['1.txt', '2.txt'])
+    assert len(entries) == 3
+    errors = []
+    assert list(
+        gorilla.scandir(osp.join(folder, 'no_such_dir'),
+                        on_error=errors.append)) == []
+    assert len(errors) == 1 and isinstance(errors[0], FileNotFoundError)
+    with pytest.raises(FileNotFoundError):
+        list(gorilla.scandir(osp.join(folder, 'no_such_dir')))
     with pytest.raises(TypeError):
         list(gorilla.scandir(123))
     with pytest.raises(TypeError):
         list(gorilla.scandir(folder, 111))
+    with pytest.raises(TypeError):
+        list(gorilla.scandir(folder, prefix=111))
+
+
+def test_scandir_symlink(tmp_path):
+    os.mkdir(str(tmp_path / 'x'))
+    open(str(tmp_path / 'x' / 'a.py'), 'w').close()
+    os.symlink(str(tmp_path / 'x'), str(tmp_path / 'lnk'))
+    assert set(gorilla.scandir(tmp_path, recursive=True)) == set(
+        ['lnk/a.py', 'x/a.py'])
+    assert set(
+        gorilla.scandir(tmp_path, recursive=True,
+                        follow_symlinks=False)) == set(['x/a.py'])
+
+
+def test_find_vcs_root(tmp_path):
+    os.makedirs(str(tmp_path / '.git'))
+    open(str(tmp_path / '.git' / 'HEAD'), 'w').close()
+    open(str(tmp_path / 'setup.py'), 'w').close()
+    sub_dir = str(tmp_path / 'a' / 'b')
+    os.makedirs(sub_dir)
+    root = str(tmp_path)
+    assert gorilla.find_vcs_root(sub_dir) == root
+    assert gorilla.find_vcs_root(sub_dir, markers=('.git/HEAD', )) == root
+    assert gorilla.find_vcs_root(sub_dir,
+                                 markers=('setup.py', 'setup.cfg')) == root
+    assert gorilla.find_vcs_root(sub_dir,
+                                 markers=('no_such_marker', )) is None
+
+
+def test_list_dir():
+    folder = osp.join(osp.dirname(osp.dirname(__file__)), 'data/for_scan')
+    assert gorilla.list_dir(folder) == [
+        '1.json', '1.txt', '2.json', '2.txt', 'a.bin'
+    ]
+    assert gorilla.list_dir(folder, '.txt', recursive=True) == [
+        '1.txt', '2.txt', 'sub/1.txt'
+    ]